@@ -0,0 +1,28 @@
+"""
+Route decorators for the CRA Mobile API
+"""
+from functools import wraps
+from flask import jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+def require_roles(*roles):
+    """
+    Require a valid access token whose user has one of the given roles
+
+    The current user's identity is passed to the view as its first argument.
+
+    Args:
+        *roles (str): Roles allowed to call the view
+    """
+    allowed = frozenset(roles)
+
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            current_user = get_jwt_identity()
+            if current_user.get('role') not in allowed:
+                return jsonify({"error": "Unauthorized"}), 403
+            return fn(current_user, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,18 +1,39 @@
 """
 API routes for the CRA Mobile API
 """
+import base64
+import binascii
+import json
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import (
     jwt_required, get_jwt_identity, create_access_token
 )
 from database import (
-    get_pending_alerts, get_alerts, add_alert, 
-    close_alert, get_alert_stats
+    get_pending_alerts, get_alerts, get_alerts_cursor, add_alert, 
+    add_alerts, close_alert, get_alert_stats
 )
 from auth import authenticate_user, generate_tokens
+from config.settings import Config
+from api.decorators import require_roles
+from api.serialization import struct_response
 from utils import register_device, unregister_device, notify_new_alert
 from utils.notifications import send_fcm_notification
 
+def _encode_cursor(alert):
+    """Build an opaque pagination cursor pointing after the given alert"""
+    raw = json.dumps([alert.timestamp, alert.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def _decode_cursor(cursor):
+    """Decode a pagination cursor into (timestamp, id), raising ValueError if malformed"""
+    try:
+        before_ts, before_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (TypeError, UnicodeError, binascii.Error, json.JSONDecodeError) as e:
+        raise ValueError("Malformed cursor") from e
+    if not isinstance(before_ts, str) or not isinstance(before_id, int):
+        raise ValueError("Malformed cursor")
+    return before_ts, before_id
+
 # Create blueprints for different API sections
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 alerts_bp = Blueprint('alerts', __name__, url_prefix='/api/alerts')
@@ -63,49 +84,45 @@ def get_user():
 @jwt_required()
 def get_all_alerts():
     """Get alerts endpoint"""
-    current_user = get_jwt_identity()
-    
     # Get query parameters
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(max(1, request.args.get('per_page', 20, type=int)), Config.MAX_ALERTS_PER_PAGE)
     show_closed = request.args.get('show_closed', 'false').lower() == 'true'
-    
-    # Get alerts
-    alerts, total_count = get_alerts(page, per_page, show_closed)
-    
-    return jsonify({
+    cursor = request.args.get('cursor', None)
+    
+    # Get alerts, preferring keyset pagination when the client sends a cursor
+    if cursor:
+        try:
+            before_ts, before_id = _decode_cursor(cursor)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        alerts, has_more = get_alerts_cursor(before_ts, before_id, per_page, show_closed)
+        response = {}
+    else:
+        alerts, has_more = get_alerts(page, per_page, show_closed)
+        response = {'page': page}
+    
+    response.update({
         'alerts': alerts,
-        'total': total_count,
-        'page': page,
         'per_page': per_page,
-        'pages': (total_count + per_page - 1) // per_page
-    }), 200
+        'has_more': has_more,
+        'next_cursor': _encode_cursor(alerts[-1]) if has_more and alerts else None
+    })
+    return struct_response(response, 200)
 
 @alerts_bp.route('/pending', methods=['GET'])
-@jwt_required()
-def get_pending():
+@require_roles('receiver', 'admin')
+def get_pending(current_user):
     """Get pending alerts endpoint"""
-    current_user = get_jwt_identity()
-    
-    # Check if user has receiver role
-    if current_user.get('role') not in ['receiver', 'admin']:
-        return jsonify({"error": "Unauthorized"}), 403
-    
     # Get pending alerts
     alerts = get_pending_alerts()
     
-    return jsonify(alerts), 200
+    return struct_response(alerts, 200)
 
 @alerts_bp.route('', methods=['POST'])
-@jwt_required()
-def create_alert():
+@require_roles('sender', 'admin')
+def create_alert(current_user):
     """Create alert endpoint"""
-    current_user = get_jwt_identity()
-    
-    # Check if user has sender role
-    if current_user.get('role') not in ['sender', 'admin']:
-        return jsonify({"error": "Unauthorized"}), 403
-    
     # Get request data
     if not request.is_json:
         return jsonify({"error": "Missing JSON in request"}), 400
@@ -118,20 +135,57 @@ def create_alert():
         return jsonify({"error": "Missing required fields"}), 400
     
     # Add alert
-    alert_id = add_alert(file_number, test_name, value)
-    
-    if not alert_id:
+    alert_data = add_alert(file_number, test_name, value)
+
+    if not alert_data:
         return jsonify({"error": "Failed to add alert"}), 500
+
+    # Send notifications
+    notify_new_alert(alert_data)
+
+    return jsonify({"id": alert_data.id, "message": "Alert created successfully"}), 201
+
+@alerts_bp.route('/batch', methods=['POST'])
+@require_roles('sender', 'admin')
+def create_alerts_batch(current_user):
+    """Create alerts in batch endpoint"""
+    # Get request data
+    if not request.is_json or not isinstance(request.json, dict):
+        return jsonify({"error": "Missing JSON in request"}), 400
+    
+    items = request.json.get('alerts', None)
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Missing alerts"}), 400
     
-    # Get the alert data
-    alerts, _ = get_alerts(1, 1, False)
-    alert_data = next((a for a in alerts if a['id'] == alert_id), None)
+    if len(items) > Config.MAX_ALERT_BATCH:
+        return jsonify({"error": f"Too many alerts (maximum {Config.MAX_ALERT_BATCH})"}), 400
+    
+    rows = []
+    for item in items:
+        if not isinstance(item, dict):
+            return jsonify({"error": "Missing required fields"}), 400
+        
+        file_number = item.get('file_number', None)
+        test_name = item.get('test_name', None)
+        value = item.get('value', None)
+        
+        if not file_number or not test_name or not value:
+            return jsonify({"error": "Missing required fields"}), 400
+        
+        rows.append((file_number, test_name, value))
+    
+    # Add alerts
+    alerts = add_alerts(rows)
+    
+    if not alerts:
+        return jsonify({"error": "Failed to add alerts"}), 500
     
     # Send notifications
-    if alert_data:
+    for alert_data in alerts:
         notify_new_alert(alert_data)
     
-    return jsonify({"id": alert_id, "message": "Alert created successfully"}), 201
+    return jsonify({"ids": [alert.id for alert in alerts], "message": "Alerts created successfully"}), 201
 
 @alerts_bp.route('/<int:alert_id>/close', methods=['PUT'])
 @jwt_required()
@@ -148,15 +202,9 @@ def mark_alert_closed(alert_id):
     return jsonify({"message": "Alert closed successfully"}), 200
 
 @alerts_bp.route('/stats', methods=['GET'])
-@jwt_required()
-def get_stats():
+@require_roles('admin')
+def get_stats(current_user):
     """Get alert statistics endpoint"""
-    current_user = get_jwt_identity()
-    
-    # Check if user has admin role
-    if current_user.get('role') != 'admin':
-        return jsonify({"error": "Unauthorized"}), 403
-    
     # Get days parameter
     days = request.args.get('days', 30, type=int)
     
@@ -0,0 +1,73 @@
+"""
+JSON serialization for the CRA Mobile API
+"""
+import decimal
+import sqlite3
+import msgspec
+import orjson
+from flask import current_app
+from flask.json.provider import JSONProvider
+
+# Allow non-string dict keys (e.g. a NULL test_name in the stats distribution)
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def _default(obj):
+    """
+    Serialize the few types orjson does not handle natively
+    """
+    # Database rows are handed straight to the encoder instead of being
+    # copied into dicts by the query helpers
+    if isinstance(obj, sqlite3.Row):
+        return dict(obj)
+    if isinstance(obj, msgspec.Struct):
+        return msgspec.structs.asdict(obj)
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+# Encoder for responses made of msgspec Structs (alerts), which it writes
+# straight to JSON without building a dict per record
+_struct_encoder = msgspec.json.Encoder(enc_hook=_default)
+
+def struct_response(obj, status=200):
+    """
+    Build a JSON response from data containing msgspec Structs
+
+    Args:
+        obj: Data to encode (Structs, dicts, lists and scalars)
+        status (int): HTTP status code
+
+    Returns:
+        flask.Response: JSON response
+    """
+    return current_app.response_class(
+        _struct_encoder.encode(obj),
+        status=status,
+        mimetype="application/json"
+    )
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider backed by orjson
+
+    orjson encodes in C and writes UTF-8 directly instead of escaping the
+    Arabic text in user names and notifications. jsonify() responses are
+    built from the encoded bytes without a round trip through str.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS),
+            mimetype="application/json"
+        )
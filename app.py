@@ -1,30 +1,47 @@
 """
 CRA Mobile API - Main Application File
 """
+# Patch blocking I/O before anything else imports socket/ssl/threading
+from gevent import monkey
+monkey.patch_all()
+
+import logging
 import os
 from flask import Flask, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
-
-# Comment out the imports that don't exist in the deployment environment
-# from config.settings import Config
-# from api.routes import register_routes
+from config.settings import Config
+from api.routes import register_routes
+from api.serialization import OrjsonProvider
+from auth import CachingJWTManager, initialize_user_passwords
+from database import init_db, close_all_connections
 
-# Create a simple Config class since the original is not available
-class Config:
-    SECRET_KEY = os.environ.get('SECRET_KEY', 'default-dev-key')
-    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'default-jwt-key')
+# Keep per-request info logging off the hot path when served by gunicorn
+if __name__ != '__main__':
+    logging.getLogger().setLevel(logging.WARNING)
 
 def create_app(config_class=Config):
     """Create and configure the Flask application"""
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.json = OrjsonProvider(app)
     
     # Initialize extensions
     CORS(app)
-    JWTManager(app)
+    CachingJWTManager(app)
+    
+    # Hash (or load cached) user passwords once, before serving requests
+    initialize_user_passwords()
+    
+    # Bring the shared database up to the schema this API expects
+    init_db()
+    
+    # Don't let SQLite connections opened here cross a fork into the
+    # gunicorn workers (preload_app); each worker opens its own
+    close_all_connections()
+    
+    # Register API routes
+    register_routes(app)
     
-    # Since we can't import register_routes, define routes directly here
     @app.route('/')
     def index():
         return jsonify({
@@ -45,12 +62,6 @@ def create_app(config_class=Config):
             "uptime": "active"
         })
     
-    # Try to register API routes if available, but don't fail if not
-    # try:
-    #     register_routes(app)
-    # except (ImportError, NameError):
-    #     pass
-    
     return app
 
 # This is the application instance that gunicorn will use
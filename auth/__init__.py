@@ -7,3 +7,5 @@ from .auth import (
     generate_tokens,
     initialize_user_passwords
 )
+from .jwt_cache import CachingJWTManager
+from .models import Identity
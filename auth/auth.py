@@ -2,9 +2,18 @@
 Authentication utilities for the CRA Mobile API
 """
 import bcrypt
+import hashlib
+import hmac
+import json
 import logging
+import os
+import stat
+import threading
+from cachetools import TTLCache
 from flask_jwt_extended import create_access_token, create_refresh_token
+from config.settings import Config
 from database import log_security_event
+from .models import Identity
 
 # User data - in a real application, this would be stored in a database
 # This matches the user data from the original CRA system
@@ -23,15 +32,110 @@ INITIAL_PASSWORDS = {
     "admin": "admin123"
 }
 
+# Recently verified (user_id, HMAC(pepper, credentials)) pairs, so repeated
+# logins skip bcrypt. The pepper keeps keys unlinkable from the stored hashes.
+_auth_cache = TTLCache(maxsize=Config.AUTH_CACHE_SIZE, ttl=Config.AUTH_CACHE_TTL)
+_auth_cache_lock = threading.Lock()
+
+def _password_fingerprint(user_id, password):
+    """
+    Fingerprint an initial password and work factor for the hash cache
+
+    Cached hashes are only reused while the fingerprint still matches, so
+    changing INITIAL_PASSWORDS or BCRYPT_ROUNDS re-hashes the password.
+
+    Args:
+        user_id (str): User ID
+        password (str): Plain text initial password
+
+    Returns:
+        str: Hex HMAC keyed with SECRET_KEY
+    """
+    return hmac.new(
+        Config.SECRET_KEY.encode('utf-8'),
+        f"{user_id}:{Config.BCRYPT_ROUNDS}:{password}".encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+
+def _load_cached_hashes():
+    """
+    Load previously computed password hashes from disk
+
+    The cache is only trusted if it is a regular file owned by this user and
+    not accessible to anyone else.
+
+    Returns:
+        dict: User ID to {"hash": bcrypt hash, "fingerprint": str}; empty if
+            there is no usable cache
+    """
+    path = Config.PASSWORD_HASH_CACHE
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+        with os.fdopen(fd, 'r', encoding='utf-8') as f:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode) or st.st_uid != os.geteuid() or st.st_mode & 0o077:
+                logging.warning("Ignoring password hash cache %s: not a private file owned by this user", path)
+                return {}
+            cached = json.load(f)
+        return {
+            user_id: entry for user_id, entry in cached.items()
+            if isinstance(entry, dict) and isinstance(entry.get("hash"), str)
+            and isinstance(entry.get("fingerprint"), str)
+        }
+    except Exception as e:
+        logging.error("Error loading password hash cache: %s", e)
+        return {}
+
+def _save_cached_hashes(entries):
+    """
+    Persist password hashes so later process starts can skip bcrypt
+
+    Args:
+        entries (dict): User ID to {"hash": bcrypt hash, "fingerprint": str}
+    """
+    path = Config.PASSWORD_HASH_CACHE
+    if not path:
+        return
+    try:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logging.error("Error saving password hash cache: %s", e)
+
 def initialize_user_passwords():
     """
     Initialize user passwords with bcrypt hashing
+
+    Hashes are reused from the on-disk cache (if PASSWORD_HASH_CACHE is set)
+    while their fingerprint matches the current initial password, so only
+    new or changed users pay for bcrypt. Called once from create_app.
     """
+    cached = _load_cached_hashes()
+    changed = False
+
     for user in USERS:
         if user["id"] in INITIAL_PASSWORDS and not user["password_hash"]:
             password = INITIAL_PASSWORDS[user["id"]]
+            fingerprint = _password_fingerprint(user["id"], password)
+            entry = cached.get(user["id"])
+            if entry and hmac.compare_digest(entry["fingerprint"], fingerprint):
+                user["password_hash"] = entry["hash"].encode('utf-8')
+                continue
             user["password_hash"] = hash_password(password)
-            logging.info(f"Initialized password for user {user['id']}")
+            cached[user["id"]] = {
+                "hash": user["password_hash"].decode('utf-8'),
+                "fingerprint": fingerprint
+            }
+            changed = True
+            logging.info("Initialized password for user %s", user['id'])
+
+    if changed:
+        _save_cached_hashes(cached)
 
 def hash_password(password):
     """
@@ -43,7 +147,7 @@ def hash_password(password):
     Returns:
         bytes: Hashed password
     """
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=Config.BCRYPT_ROUNDS))
 
 def check_password(password, hashed_password):
     """
@@ -58,6 +162,35 @@ def check_password(password, hashed_password):
     """
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
 
+def _verify_user_password(user, password):
+    """
+    Check a user's password, skipping bcrypt if it was verified recently
+    
+    Args:
+        user (dict): User data
+        password (str): Plain text password
+        
+    Returns:
+        bool: True if password matches, False otherwise
+    """
+    digest = hmac.new(
+        Config.AUTH_CACHE_PEPPER,
+        f"{user['id']}:{password}".encode('utf-8'),
+        hashlib.sha256
+    ).digest()
+    key = (user["id"], digest)
+    
+    with _auth_cache_lock:
+        if key in _auth_cache:
+            return True
+    
+    if not check_password(password, user["password_hash"]):
+        return False
+    
+    with _auth_cache_lock:
+        _auth_cache[key] = True
+    return True
+
 def authenticate_user(user_id, password, required_role=None):
     """
     Authenticate a user
@@ -70,29 +203,27 @@ def authenticate_user(user_id, password, required_role=None):
     Returns:
         dict: User data if authentication successful, None otherwise
     """
-    # Ensure passwords are initialized
-    initialize_user_passwords()
+    user = USERS_BY_ID.get(user_id)
     
-    for user in USERS:
-        if user["id"] == user_id:
-            # Check password
-            if check_password(password, user["password_hash"]):
-                # Check role if required
-                if required_role is None or user["role"] == required_role or user["role"] == "admin":
-                    # Log successful login
-                    log_security_event("login_success", user_id)
-                    return user
-                else:
-                    # Log failed login due to insufficient role
-                    log_security_event("login_failure", user_id, f"Insufficient role: {user['role']}, required: {required_role}")
-                    return None
-            else:
-                # Log failed login due to invalid password
-                log_security_event("login_failure", user_id, "Invalid password")
-                return None
+    if user is None:
+        # Log failed login due to user not found
+        log_security_event("login_failure", user_id, "User not found")
+        return None
+    
+    # Check password (hashes are set up by initialize_user_passwords at start-up)
+    if not user["password_hash"] or not _verify_user_password(user, password):
+        # Log failed login due to invalid password
+        log_security_event("login_failure", user_id, "Invalid password")
+        return None
     
-    # Log failed login due to user not found
-    log_security_event("login_failure", user_id, "User not found")
+    # Check role if required
+    if required_role is None or user["role"] == required_role or user["role"] == "admin":
+        # Log successful login
+        log_security_event("login_success", user_id)
+        return user
+    
+    # Log failed login due to insufficient role
+    log_security_event("login_failure", user_id, f"Insufficient role: {user['role']}, required: {required_role}")
     return None
 
 def get_user_by_id(user_id):
@@ -103,15 +234,9 @@ def get_user_by_id(user_id):
         user_id (str): User ID
         
     Returns:
-        dict: User data if found, None otherwise
+        Identity: User data (without the password hash) if found, None otherwise
     """
-    for user in USERS:
-        if user["id"] == user_id:
-            # Return a copy without the password hash
-            user_copy = user.copy()
-            user_copy.pop("password_hash", None)
-            return user_copy
-    return None
+    return IDENTITIES_BY_ID.get(user_id)
 
 def generate_tokens(user):
     """
@@ -123,18 +248,19 @@ def generate_tokens(user):
     Returns:
         dict: Access and refresh tokens
     """
-    # Create a copy of user data without the password hash
-    identity = {
-        "id": user["id"],
-        "role": user["role"],
-        "name": user["name"]
-    }
+    # Public user data, without the password hash
+    identity = IDENTITIES_BY_ID[user["id"]]
+    claims = identity.to_claims()
     
-    access_token = create_access_token(identity=identity)
-    refresh_token = create_refresh_token(identity=identity)
+    access_token = create_access_token(identity=claims)
+    refresh_token = create_refresh_token(identity=claims)
     
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "user": identity
     }
+
+# Index users by ID for O(1) lookups
+USERS_BY_ID = {user["id"]: user for user in USERS}
+IDENTITIES_BY_ID = {user["id"]: Identity.from_user(user) for user in USERS}
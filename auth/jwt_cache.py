@@ -0,0 +1,63 @@
+"""
+Short-lived cache for verified JWT payloads
+"""
+import hashlib
+import threading
+import time
+from cachetools import TLRUCache
+from flask_jwt_extended import JWTManager
+from config.settings import Config
+
+def _token_ttu(_key, payload, now):
+    """
+    Expire a cached payload after the configured TTL, or when the token itself
+    expires, whichever comes first
+    """
+    expires_at = now + Config.JWT_VERIFY_CACHE_TTL
+    exp = payload.get("exp")
+    if exp is not None:
+        expires_at = min(expires_at, exp)
+    return expires_at
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that skips signature verification for recently verified tokens
+
+    Mobile clients reuse the same access token for its whole lifetime, so the
+    decoded payload is kept for a few seconds keyed by a digest of the token.
+    Blocklist and user lookup callbacks still run on every request.
+    """
+
+    def __init__(self, app=None, add_context_processor=False):
+        self._verified_tokens = TLRUCache(
+            maxsize=Config.JWT_VERIFY_CACHE_SIZE,
+            ttu=_token_ttu,
+            timer=time.time
+        )
+        self._verified_lock = threading.Lock()
+        super().__init__(app, add_context_processor)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        # Expired tokens are only decoded on purpose, never serve them from cache
+        if allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = (hashlib.sha256(encoded_token.encode("utf-8")).digest()[:16], csrf_value)
+
+        with self._verified_lock:
+            payload = self._verified_tokens.get(key)
+        if payload is not None:
+            return payload
+
+        payload = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        with self._verified_lock:
+            self._verified_tokens[key] = payload
+        return payload
+
+    def clear_verified_tokens(self):
+        """
+        Drop all cached payloads (e.g. after rotating the signing key)
+        """
+        with self._verified_lock:
+            self._verified_tokens.clear()
@@ -0,0 +1,34 @@
+"""
+Record types for authentication
+"""
+import msgspec
+
+class Identity(msgspec.Struct, frozen=True, gc=False):
+    """
+    The public part of a user, as carried in JWTs and returned to clients
+    """
+    id: str
+    role: str
+    name: str
+
+    @classmethod
+    def from_user(cls, user):
+        """
+        Build an identity from a user record
+
+        Args:
+            user (dict): User data
+
+        Returns:
+            Identity: The user's identity
+        """
+        return cls(user["id"], user["role"], user["name"])
+
+    def to_claims(self):
+        """
+        Get the identity as a plain dict for the JWT subject claim
+
+        Returns:
+            dict: Identity fields
+        """
+        return msgspec.structs.asdict(self)
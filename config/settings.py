@@ -4,6 +4,33 @@ Configuration settings for the CRA Mobile API
 import os
 from datetime import timedelta
 
+def _load_pem_key(env_name, private=False):
+    """
+    Parse a PEM key from the environment once, at start-up
+
+    PyJWT accepts the parsed key object, so tokens are signed and verified
+    without re-reading the PEM on every request.
+
+    Args:
+        env_name (str): Environment variable holding the PEM text
+        private (bool): Whether the variable holds a private key
+
+    Returns:
+        The parsed key, or None if the variable is not set
+    """
+    pem = os.environ.get(env_name, '')
+    if not pem:
+        return None
+
+    # Only needed for asymmetric algorithms
+    from cryptography.hazmat.primitives import serialization
+
+    # Allow single-line values with escaped newlines
+    data = pem.replace('\\n', '\n').encode('utf-8')
+    if private:
+        return serialization.load_pem_private_key(data, password=None)
+    return serialization.load_pem_public_key(data)
+
 class Config:
     """Base configuration"""
     # Flask settings
@@ -11,17 +38,86 @@ class Config:
     
     # JWT settings
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
+    JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
+    JWT_DECODE_ALGORITHMS = [JWT_ALGORITHM]
+    
+    # Keys for asymmetric algorithms such as EdDSA (PEM text). The public key
+    # defaults to the one matching the private key.
+    JWT_PRIVATE_KEY = _load_pem_key('JWT_PRIVATE_KEY', private=True)
+    JWT_PUBLIC_KEY = _load_pem_key('JWT_PUBLIC_KEY') or (JWT_PRIVATE_KEY.public_key() if JWT_PRIVATE_KEY else None)
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    JWT_VERIFY_CACHE_TTL = int(os.environ.get('JWT_VERIFY_CACHE_TTL', 10))
+    JWT_VERIFY_CACHE_SIZE = int(os.environ.get('JWT_VERIFY_CACHE_SIZE', 10000))
+    
+    # bcrypt work factor for newly hashed passwords
+    BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 10))
+    
+    # Login cache settings (a random pepper is used if none is configured)
+    AUTH_CACHE_PEPPER = os.environ.get('AUTH_CACHE_PEPPER', '').encode('utf-8') or os.urandom(32)
+    AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', 60))
+    AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 1024))
+    
+    # Where initial password hashes are cached between process starts (off
+    # unless set; use a directory only the app user can write to)
+    PASSWORD_HASH_CACHE = os.environ.get('PASSWORD_HASH_CACHE', '')
     
     # Database settings
     DATABASE_PATH = os.environ.get('DATABASE_PATH', '/home/ubuntu/cra_improved/data/alerts.db')
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 16))
+    DATABASE_TIMEOUT = float(os.environ.get('DATABASE_TIMEOUT', 5.0))
+    
+    # How long polls of the pending alerts list may share a result (seconds)
+    PENDING_ALERTS_CACHE_TTL = float(os.environ.get('PENDING_ALERTS_CACHE_TTL', 1.0))
+    
+    # Security log writer settings (events are flushed in batches)
+    SECURITY_LOG_QUEUE_SIZE = int(os.environ.get('SECURITY_LOG_QUEUE_SIZE', 10000))
+    SECURITY_LOG_BATCH_SIZE = int(os.environ.get('SECURITY_LOG_BATCH_SIZE', 100))
+    SECURITY_LOG_FLUSH_INTERVAL = float(os.environ.get('SECURITY_LOG_FLUSH_INTERVAL', 0.2))
+    
+    # Maximum number of alerts accepted by POST /api/alerts/batch
+    MAX_ALERT_BATCH = int(os.environ.get('MAX_ALERT_BATCH', 500))
+    
+    # Largest page GET /api/alerts returns (per_page is clamped to 1..this)
+    MAX_ALERTS_PER_PAGE = int(os.environ.get('MAX_ALERTS_PER_PAGE', 100))
     
     # Firebase Cloud Messaging settings
     FCM_API_KEY = os.environ.get('FCM_API_KEY', '')
+    FCM_POOL_SIZE = int(os.environ.get('FCM_POOL_SIZE', 32))
+    FCM_TIMEOUT = float(os.environ.get('FCM_TIMEOUT', 10.0))
+    
+    # Device token storage (tokens are kept in process memory without Redis)
+    REDIS_URL = os.environ.get('REDIS_URL', '')
+    REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 0.5))
+    REDIS_RETRY_INTERVAL = float(os.environ.get('REDIS_RETRY_INTERVAL', 5.0))
+    DEVICE_TOKEN_TTL = int(os.environ.get('DEVICE_TOKEN_TTL', 2592000))
+    DEVICE_TOKEN_CACHE_SIZE = int(os.environ.get('DEVICE_TOKEN_CACHE_SIZE', 10000))
+    
+    # Adaptive FCM concurrency: grows while mean latency stays within the
+    # target (seconds), halves on slow responses or rate limiting
+    FCM_CONCURRENCY_INITIAL = int(os.environ.get('FCM_CONCURRENCY_INITIAL', 8))
+    FCM_CONCURRENCY_MIN = int(os.environ.get('FCM_CONCURRENCY_MIN', 2))
+    FCM_CONCURRENCY_MAX = int(os.environ.get('FCM_CONCURRENCY_MAX', 64))
+    FCM_TARGET_LATENCY = float(os.environ.get('FCM_TARGET_LATENCY', 0.15))
     
     # Twilio settings (for WhatsApp notifications)
     TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID', '')
     TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN', '')
     TWILIO_FROM_WHATSAPP = os.environ.get('TWILIO_FROM_WHATSAPP', '')
     TWILIO_TO_WHATSAPP = os.environ.get('TWILIO_TO_WHATSAPP', '')
+    TWILIO_POOL_SIZE = int(os.environ.get('TWILIO_POOL_SIZE', 16))
+    TWILIO_TIMEOUT = float(os.environ.get('TWILIO_TIMEOUT', 10.0))
+    TWILIO_MPS = float(os.environ.get('TWILIO_MPS', 1.0))
+    TWILIO_RATE_LIMIT_TIMEOUT = float(os.environ.get('TWILIO_RATE_LIMIT_TIMEOUT', 30.0))
+    
+    # Number of worker processes sharing per-process limits such as
+    # TWILIO_MPS when Redis is not configured (set per worker by gunicorn.conf.py)
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+    
+    # Background notification dispatch settings
+    NOTIFICATION_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_QUEUE_SIZE', 10000))
+    NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS', 4))
+    NOTIFICATION_DRAIN_TIMEOUT = float(os.environ.get('NOTIFICATION_DRAIN_TIMEOUT', 10.0))
+    NOTIFICATION_WHATSAPP_WORKERS = int(os.environ.get('NOTIFICATION_WHATSAPP_WORKERS', 1))
+    NOTIFICATION_DEDUP_TTL = float(os.environ.get('NOTIFICATION_DEDUP_TTL', 60))
+    NOTIFICATION_DEDUP_SIZE = int(os.environ.get('NOTIFICATION_DEDUP_SIZE', 4096))
@@ -3,10 +3,16 @@ Initialize the database package
 """
 from .db import (
     get_db_connection,
+    init_db,
     get_pending_alerts,
     get_alerts,
+    get_alerts_cursor,
     add_alert,
+    add_alerts,
     close_alert,
     get_alert_stats,
-    log_security_event
+    log_security_event,
+    flush_security_events
 )
+from .pool import pooled_connection, close_all_connections
+from .models import Alert
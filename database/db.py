@@ -1,50 +1,129 @@
 """
 Database operations for the CRA Mobile API
 """
-import sqlite3
+import atexit
 import logging
+import os
+import queue
+import threading
+import time
 from datetime import datetime
+from cachetools import TTLCache
 from config.settings import Config
+from .models import Alert
+from .pool import create_connection, pooled_connection
+
+# Columns of critical_alerts exposed through the API, in Alert field order
+ALERT_COLUMNS = "id, file_number, test_name, value, timestamp, shown, closed_by, closed_at"
+
+# Short-lived cache of the pending alerts list
+_pending_cache = TTLCache(maxsize=1, ttl=Config.PENDING_ALERTS_CACHE_TTL)
+_pending_cache_lock = threading.Lock()
+
+# Security events waiting to be written by the background writer
+_security_events = queue.Queue(maxsize=Config.SECURITY_LOG_QUEUE_SIZE)
+_security_writer_lock = threading.Lock()
+_security_writer_pid = None
 
 def get_db_connection():
     """
-    Create a connection to the SQLite database
+    Create a standalone connection to the SQLite database
+    
+    The query helpers below borrow pooled connections instead; use this only
+    when the caller manages the connection's lifetime itself.
     
     Returns:
         sqlite3.Connection: Database connection object
     """
     try:
-        conn = sqlite3.connect(Config.DATABASE_PATH)
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-        return conn
+        return create_connection()
     except Exception as e:
-        logging.error(f"Database connection error: {e}")
+        logging.error("Database connection error: %s", e)
         raise
 
+def init_db():
+    """
+    Apply the API's additive schema changes to the shared CRA database
+
+    Every step is idempotent, so this is safe to run on each start-up.
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            # Unix-epoch copy of timestamp so period filters can use an index.
+            # timestamp is local time, so it is converted with 'utc'. The API
+            # writes timestamp_ts itself; the trigger covers rows inserted by
+            # the desktop CRA system.
+            columns = [row['name'] for row in cursor.execute("PRAGMA table_info(critical_alerts)")]
+            if 'timestamp_ts' not in columns:
+                cursor.execute("ALTER TABLE critical_alerts ADD COLUMN timestamp_ts INTEGER")
+            cursor.execute("""
+            UPDATE critical_alerts SET timestamp_ts = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+            WHERE timestamp_ts IS NULL
+            """)
+            cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_alerts_timestamp_ts
+            AFTER INSERT ON critical_alerts
+            WHEN NEW.timestamp_ts IS NULL
+            BEGIN
+                UPDATE critical_alerts SET timestamp_ts = CAST(strftime('%s', NEW.timestamp, 'utc') AS INTEGER)
+                WHERE id = NEW.id;
+            END
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_timestamp_ts ON critical_alerts(timestamp_ts)")
+
+            # Let paginated listings (offset and keyset) walk an index in
+            # order instead of sorting
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_shown_ts_id ON critical_alerts(shown, timestamp DESC, id DESC)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_ts_id ON critical_alerts(timestamp DESC, id DESC)")
+
+            conn.commit()
+
+        logging.info("Database schema is up to date")
+        return True
+    except Exception as e:
+        logging.error("Error initializing database schema: %s", e)
+        return False
+
 def get_pending_alerts():
     """
     Get alerts that have not been shown yet
     
     Returns:
-        list: List of pending alerts
+        list: List of pending alerts (Alert)
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        # Receivers poll this endpoint; polls within the cache TTL share a result
+        with _pending_cache_lock:
+            alerts = _pending_cache.get('pending')
+        if alerts is not None:
+            return alerts
         
-        cursor.execute("SELECT * FROM critical_alerts WHERE shown = 0")
-        rows = cursor.fetchall()
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
         
-        alerts = []
-        for row in rows:
-            alerts.append(dict(row))
+            # Reads only pending rows, in order, from idx_alerts_shown_ts_id
+            cursor.execute(f"SELECT {ALERT_COLUMNS} FROM critical_alerts WHERE shown = 0 ORDER BY timestamp DESC, id DESC")
+            alerts = [Alert.from_row(row) for row in cursor.fetchall()]
         
-        conn.close()
+        with _pending_cache_lock:
+            _pending_cache['pending'] = alerts
         return alerts
     except Exception as e:
-        logging.error(f"Error getting pending alerts: {e}")
+        logging.error("Error getting pending alerts: %s", e)
         return []
 
+def _invalidate_pending_alerts():
+    """
+    Drop the cached pending alerts after this process changes them
+    """
+    with _pending_cache_lock:
+        _pending_cache.clear()
+
 def get_alerts(page=1, per_page=20, show_closed=False):
     """
     Get alerts with pagination
@@ -55,40 +134,119 @@ def get_alerts(page=1, per_page=20, show_closed=False):
         show_closed (bool): Whether to include closed alerts
         
     Returns:
-        tuple: (alerts, total_count)
+        tuple: (alerts as Alert list, has_more)
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+        
+            # Build query based on whether to show closed alerts
+            query = f"SELECT {ALERT_COLUMNS} FROM critical_alerts"
         
-        # Build query based on whether to show closed alerts
-        query = "SELECT * FROM critical_alerts"
-        count_query = "SELECT COUNT(*) FROM critical_alerts"
+            if not show_closed:
+                query += " WHERE shown = 0"
+        
+            # Add ordering and pagination. One extra row tells us whether
+            # another page exists without counting the whole table.
+            query += " ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+        
+            # Get paginated results
+            cursor.execute(query, (per_page + 1, (page - 1) * per_page))
+            rows = cursor.fetchall()
+        
+        has_more = len(rows) > per_page
+        
+        return ([Alert.from_row(row) for row in rows[:per_page]], has_more)
+    except Exception as e:
+        logging.error("Error getting alerts: %s", e)
+        return ([], False)
+
+def get_alerts_cursor(before_ts=None, before_id=None, per_page=20, show_closed=False):
+    """
+    Get alerts with keyset pagination
+    
+    Pages are anchored on the (timestamp, id) of the last alert the client
+    saw, so each page is an index seek no matter how deep it is.
+    
+    Args:
+        before_ts (str, optional): Timestamp of the last alert already seen
+        before_id (int, optional): ID of the last alert already seen
+        per_page (int): Number of items per page
+        show_closed (bool): Whether to include closed alerts
+        
+    Returns:
+        tuple: (alerts as Alert list, has_more)
+    """
+    try:
+        conditions = []
+        params = []
         
         if not show_closed:
-            query += " WHERE shown = 0"
-            count_query += " WHERE shown = 0"
+            conditions.append("shown = 0")
         
-        # Add ordering and pagination
-        query += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
+        if before_ts is not None and before_id is not None:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend([before_ts, before_id])
         
-        # Get total count
-        cursor.execute(count_query)
-        total_count = cursor.fetchone()[0]
+        query = f"SELECT {ALERT_COLUMNS} FROM critical_alerts"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(per_page + 1)
         
-        # Get paginated results
-        cursor.execute(query, (per_page, (page - 1) * per_page))
-        rows = cursor.fetchall()
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
         
-        alerts = []
-        for row in rows:
-            alerts.append(dict(row))
+        has_more = len(rows) > per_page
+        
+        return ([Alert.from_row(row) for row in rows[:per_page]], has_more)
+    except Exception as e:
+        logging.error("Error getting alerts by cursor: %s", e)
+        return ([], False)
+
+def add_alerts(rows):
+    """
+    Add several critical alerts in a single transaction
+    
+    All rows share one commit, so a burst of alerts pays for one journal
+    sync instead of one per alert. Either every row is added or none is.
+    
+    Args:
+        rows (list): (file_number, test_name, value) tuples
         
-        conn.close()
-        return (alerts, total_count)
+    Returns:
+        list: The new alerts (Alert), or None if failed
+    """
+    try:
+        alerts = []
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            # executemany() discards RETURNING rows, so insert row by row
+            # inside the one transaction and read each row back directly.
+            # The timestamp is taken by SQLite, in the same local-time format
+            # the desktop CRA system writes; timestamp_ts is set here so the
+            # insert trigger has nothing to do.
+            for file_number, test_name, value in rows:
+                cursor.execute(f"""
+                INSERT INTO critical_alerts
+                    (file_number, test_name, value, timestamp, shown, timestamp_ts)
+                    VALUES (?, ?, ?, datetime('now', 'localtime'), 0, CAST(strftime('%s', 'now') AS INTEGER))
+                    RETURNING {ALERT_COLUMNS}
+                """, (file_number, test_name, value))
+                alerts.append(Alert.from_row(cursor.fetchone()))
+
+            conn.commit()
+
+        _invalidate_pending_alerts()
+        for alert in alerts:
+            logging.info("Added critical alert: ID=%s, File=%s, Test=%s, Value=%s", alert.id, alert.file_number, alert.test_name, alert.value)
+        return alerts
     except Exception as e:
-        logging.error(f"Error getting alerts: {e}")
-        return ([], 0)
+        logging.error("Error adding critical alerts: %s", e)
+        return None
 
 def add_alert(file_number, test_name, value):
     """
@@ -100,28 +258,10 @@ def add_alert(file_number, test_name, value):
         value (str): Test value
         
     Returns:
-        int: ID of the new alert, or None if failed
+        Alert: The new alert, or None if failed
     """
-    try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-        INSERT INTO critical_alerts 
-            (file_number, test_name, value, timestamp, shown)
-            VALUES (?, ?, ?, ?, 0)
-        """, (file_number, test_name, value, timestamp))
-        
-        alert_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        logging.info(f"Added critical alert: ID={alert_id}, File={file_number}, Test={test_name}, Value={value}")
-        return alert_id
-    except Exception as e:
-        logging.error(f"Error adding critical alert: {e}")
-        return None
+    alerts = add_alerts([(file_number, test_name, value)])
+    return alerts[0] if alerts else None
 
 def close_alert(alert_id, user_id):
     """
@@ -135,22 +275,21 @@ def close_alert(alert_id, user_id):
         bool: True if successful, False otherwise
     """
     try:
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute(
-            "UPDATE critical_alerts SET shown = 1, closed_by = ?, closed_at = ? WHERE id = ?",
-            (user_id, now, alert_id)
-        )
+            cursor.execute(
+                "UPDATE critical_alerts SET shown = 1, closed_by = ?, closed_at = datetime('now', 'localtime') WHERE id = ?",
+                (user_id, alert_id)
+            )
         
-        conn.commit()
-        conn.close()
+            conn.commit()
         
-        logging.info(f"Alert ID={alert_id} marked as closed by user {user_id}")
+        _invalidate_pending_alerts()
+        logging.info("Alert ID=%s marked as closed by user %s", alert_id, user_id)
         return True
     except Exception as e:
-        logging.error(f"Error marking alert as closed: {e}")
+        logging.error("Error marking alert as closed: %s", e)
         return False
 
 def get_alert_stats(days=30):
@@ -164,43 +303,34 @@ def get_alert_stats(days=30):
         dict: Statistics dictionary
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get total alerts in the period
-        cursor.execute("""
-        SELECT COUNT(*) FROM critical_alerts 
-        WHERE datetime(timestamp) >= datetime('now', ?)
-        """, (f'-{days} days',))
-        total_alerts = cursor.fetchone()[0]
-        
-        # Get closed alerts in the period
-        cursor.execute("""
-        SELECT COUNT(*) FROM critical_alerts 
-        WHERE shown = 1 AND datetime(timestamp) >= datetime('now', ?)
-        """, (f'-{days} days',))
-        closed_alerts = cursor.fetchone()[0]
-        
-        # Get average response time (in minutes)
-        cursor.execute("""
-        SELECT AVG((julianday(closed_at) - julianday(timestamp)) * 24 * 60) 
-        FROM critical_alerts 
-        WHERE shown = 1 AND closed_at IS NOT NULL 
-        AND datetime(timestamp) >= datetime('now', ?)
-        """, (f'-{days} days',))
-        avg_response_time = cursor.fetchone()[0] or 0
-        
-        # Get test type distribution
-        cursor.execute("""
-        SELECT test_name, COUNT(*) as count 
-        FROM critical_alerts 
-        WHERE datetime(timestamp) >= datetime('now', ?)
-        GROUP BY test_name 
-        ORDER BY count DESC
-        """, (f'-{days} days',))
-        test_distribution = {row['test_name']: row['count'] for row in cursor.fetchall()}
-        
-        conn.close()
+        since = int(time.time()) - days * 86400
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            # Get totals and average response time (in minutes) in one pass
+            cursor.execute("""
+            SELECT
+                COUNT(*) AS total,
+                SUM(CASE WHEN shown = 1 THEN 1 ELSE 0 END) AS closed,
+                AVG(CASE WHEN shown = 1 AND closed_at IS NOT NULL
+                    THEN (julianday(closed_at) - julianday(timestamp)) * 24 * 60 END) AS avg_response
+            FROM critical_alerts
+            WHERE timestamp_ts >= ?
+            """, (since,))
+            row = cursor.fetchone()
+            total_alerts = row['total']
+            closed_alerts = row['closed'] or 0
+            avg_response_time = row['avg_response'] or 0
+
+            # Get test type distribution
+            cursor.execute("""
+            SELECT test_name, COUNT(*) as count
+            FROM critical_alerts
+            WHERE timestamp_ts >= ?
+            GROUP BY test_name
+            ORDER BY count DESC
+            """, (since,))
+            test_distribution = {row['test_name']: row['count'] for row in cursor.fetchall()}
         
         return {
             'total_alerts': total_alerts,
@@ -210,7 +340,7 @@ def get_alert_stats(days=30):
             'test_distribution': test_distribution
         }
     except Exception as e:
-        logging.error(f"Error getting alert statistics: {e}")
+        logging.error("Error getting alert statistics: %s", e)
         return {
             'total_alerts': 0,
             'closed_alerts': 0,
@@ -219,10 +349,93 @@ def get_alert_stats(days=30):
             'test_distribution': {}
         }
 
+def _write_security_events(events):
+    """
+    Insert security events in one transaction
+    
+    Args:
+        events (list): (event_type, user_id, timestamp, details) tuples
+    """
+    with pooled_connection() as conn:
+        conn.executemany(
+            "INSERT INTO security_log (event_type, user_id, timestamp, details) VALUES (?, ?, ?, ?)",
+            events
+        )
+        conn.commit()
+
+def _security_log_writer():
+    """
+    Write queued security events in batches until the process exits
+    """
+    while True:
+        events = [_security_events.get()]
+        deadline = time.monotonic() + Config.SECURITY_LOG_FLUSH_INTERVAL
+        while len(events) < Config.SECURITY_LOG_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                events.append(_security_events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        try:
+            _write_security_events(events)
+        except Exception as e:
+            logging.error("Error writing %s security events: %s", len(events), e)
+        finally:
+            for _ in events:
+                _security_events.task_done()
+
+def _ensure_security_log_writer():
+    """
+    Start the security log writer in this process if it is not running
+    
+    The process ID is checked so forked workers start their own thread.
+    """
+    global _security_writer_pid
+    if _security_writer_pid == os.getpid():
+        return
+    with _security_writer_lock:
+        if _security_writer_pid != os.getpid():
+            threading.Thread(target=_security_log_writer, name="security-log-writer", daemon=True).start()
+            _security_writer_pid = os.getpid()
+
+def flush_security_events():
+    """
+    Write any queued security events before the process exits
+    """
+    events = []
+    while True:
+        try:
+            events.append(_security_events.get_nowait())
+        except queue.Empty:
+            break
+    
+    if events:
+        try:
+            _write_security_events(events)
+        except Exception as e:
+            logging.error("Error flushing %s security events: %s", len(events), e)
+        finally:
+            for _ in events:
+                _security_events.task_done()
+    
+    # Let a batch already taken by the writer thread finish
+    deadline = time.monotonic() + 2
+    while _security_events.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+atexit.register(flush_security_events)
+
 def log_security_event(event_type, user_id, details=""):
     """
     Log a security event
     
+    Events are queued and written in batches by a background thread, so
+    logins do not wait on the database. If the queue is full the event is
+    written immediately instead.
+    
     Args:
         event_type (str): Type of event (e.g., "login_attempt", "login_success")
         user_id (str): User ID
@@ -233,19 +446,16 @@ def log_security_event(event_type, user_id, details=""):
     """
     try:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "INSERT INTO security_log (event_type, user_id, timestamp, details) VALUES (?, ?, ?, ?)",
-            (event_type, user_id, timestamp, details)
-        )
+        event = (event_type, user_id, timestamp, details)
         
-        conn.commit()
-        conn.close()
+        try:
+            _ensure_security_log_writer()
+            _security_events.put_nowait(event)
+        except queue.Full:
+            _write_security_events([event])
         
-        logging.info(f"Security event logged: {event_type} by {user_id}")
+        logging.info("Security event logged: %s by %s", event_type, user_id)
         return True
     except Exception as e:
-        logging.error(f"Error logging security event: {e}")
+        logging.error("Error logging security event: %s", e)
         return False
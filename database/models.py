@@ -0,0 +1,36 @@
+"""
+Record types for the CRA Mobile API
+"""
+from typing import Optional
+import msgspec
+
+class Alert(msgspec.Struct, frozen=True, gc=False):
+    """
+    A critical alert row
+
+    Fields follow the column order of ALERT_COLUMNS, so a row can be
+    unpacked straight into the constructor. Alerts are slotted, immutable
+    (they are shared through the pending alerts cache) and, holding only
+    strings and integers, skipped by the garbage collector.
+    """
+    id: int
+    file_number: str
+    test_name: str
+    value: str
+    timestamp: str
+    shown: int
+    closed_by: Optional[str] = None
+    closed_at: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Build an alert from a critical_alerts row selected with ALERT_COLUMNS
+
+        Args:
+            row (sqlite3.Row): Database row
+
+        Returns:
+            Alert: The alert
+        """
+        return cls(*row)
@@ -0,0 +1,74 @@
+"""
+SQLite connection pool for the CRA Mobile API
+"""
+import atexit
+import logging
+import queue
+import sqlite3
+from contextlib import contextmanager
+from config.settings import Config
+
+# Idle connections, most recently used first so hot connections keep their
+# statement cache warm
+_pool = queue.LifoQueue(maxsize=Config.DATABASE_POOL_SIZE)
+
+def create_connection():
+    """
+    Open a new SQLite connection tuned for concurrent readers
+
+    Returns:
+        sqlite3.Connection: Database connection object
+    """
+    conn = sqlite3.connect(
+        Config.DATABASE_PATH,
+        timeout=Config.DATABASE_TIMEOUT,
+        check_same_thread=False
+    )
+    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrow a connection from the pool for the duration of a with-block
+
+    Uncommitted work is rolled back if the block raises, so a connection is
+    always returned to the pool in a clean state.
+
+    Yields:
+        sqlite3.Connection: Database connection object
+    """
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = create_connection()
+
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+def close_all_connections():
+    """
+    Close every idle connection in the pool
+    """
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            break
+        try:
+            conn.close()
+        except Exception as e:
+            logging.error("Error closing database connection: %s", e)
+
+atexit.register(close_all_connections)
@@ -0,0 +1,24 @@
+"""
+Gunicorn configuration for the CRA Mobile API
+"""
+import multiprocessing
+import os
+
+# Request handlers spend most of their time waiting on SQLite and on
+# FCM/Twilio, so use cooperative gevent workers instead of sync ones
+worker_class = "gevent"
+# Device tokens are kept in process memory unless Redis is configured, so
+# several workers would each see only the devices registered with them
+default_workers = multiprocessing.cpu_count() * 2 + 1 if os.environ.get('REDIS_URL') else 1
+workers = int(os.environ.get('WEB_CONCURRENCY', default_workers))
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+
+# Import the app (and hash user passwords) once in the master; workers
+# inherit it copy-on-write instead of each repeating the start-up work
+preload_app = True
+
+def post_fork(server, worker):
+    """Tell the app how many workers share its process-local rate limits"""
+    # server.cfg includes command-line overrides such as -w
+    from config.settings import Config
+    Config.WEB_CONCURRENCY = server.cfg.workers
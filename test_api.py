@@ -42,8 +42,9 @@ def test_alerts(access_token):
     print(f"Status: {response.status_code}")
     if response.status_code == 200:
         data = response.json()
-        print(f"Total alerts: {data.get('total')}")
+        print(f"Alerts on page: {len(data.get('alerts', []))}")
         print(f"Current page: {data.get('page')}")
+        print(f"More pages: {data.get('has_more')}")
     
     # Test create alert
     print("\nTesting create alert...")
@@ -65,6 +66,39 @@ def test_alerts(access_token):
         print(f"Status: {response.status_code}")
         if response.status_code == 200:
             print("Alert closed successfully!")
+    
+    # Test create alerts in a batch
+    print("\nTesting create alerts batch...")
+    batch_data = {
+        "alerts": [
+            {"file_number": "TEST124", "test_name": "Potassium", "value": "7.1"},
+            {"file_number": "TEST125", "test_name": "Sodium", "value": "112"}
+        ]
+    }
+    response = requests.post(f"{BASE_URL}/alerts/batch", headers=headers, json=batch_data)
+    print(f"Status: {response.status_code}")
+    if response.status_code == 201:
+        data = response.json()
+        print(f"Alerts created with IDs: {data.get('ids')}")
+    
+    # Test cursor pagination
+    print("\nTesting get alerts by cursor...")
+    response = requests.get(f"{BASE_URL}/alerts", headers=headers, params={"per_page": 1})
+    print(f"Status: {response.status_code}")
+    if response.status_code == 200:
+        data = response.json()
+        next_cursor = data.get('next_cursor')
+        print(f"Next cursor: {next_cursor}")
+        if next_cursor:
+            first_id = data['alerts'][0]['id']
+            response = requests.get(f"{BASE_URL}/alerts", headers=headers, params={"per_page": 1, "cursor": next_cursor})
+            print(f"Status: {response.status_code}")
+            if response.status_code == 200:
+                data = response.json()
+                next_ids = [alert['id'] for alert in data.get('alerts', [])]
+                print(f"Alerts after {first_id}: {next_ids}")
+                if next_ids and next_ids[0] < first_id:
+                    print("Cursor pagination working!")
 
 def test_notifications(access_token):
     """Test notification endpoints"""
@@ -3,8 +3,10 @@ Initialize the utils package
 """
 from .notifications import (
     send_fcm_notification,
+    send_fcm_multicast,
     register_device,
     unregister_device,
     send_whatsapp_alert,
-    notify_new_alert
+    notify_new_alert,
+    invalidate_receiver_cache
 )
@@ -0,0 +1,254 @@
+"""
+Device token storage for the CRA Mobile API
+"""
+import logging
+import threading
+import time
+from redis.exceptions import RedisError
+from config.settings import Config
+from .redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+class _TokenStore:
+    """
+    Lookups shared by the device token stores, built on their get()
+    """
+
+    def get_many(self, user_ids):
+        """
+        Get the device tokens of several users, skipping users without one
+
+        Args:
+            user_ids (iterable): User IDs
+
+        Returns:
+            list: (user_id, device_token) tuples
+        """
+        tokens = []
+        for user_id in user_ids:
+            token = self.get(user_id)
+            if token:
+                tokens.append((user_id, token))
+        return tokens
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+class DeviceTokenStore(_TokenStore):
+    """
+    Thread-safe map of user ID to FCM device token
+
+    Tokens are spread over a fixed number of shards, each with its own lock,
+    so notification threads looking up tokens rarely wait on each other or on
+    a device registration.
+    """
+
+    def __init__(self, shards=16):
+        """
+        Args:
+            shards (int): Number of shards (a power of two)
+        """
+        self._mask = shards - 1
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def _index(self, user_id):
+        return hash(user_id) & self._mask
+
+    def get(self, user_id, default=None):
+        """
+        Get a user's device token
+
+        Args:
+            user_id (str): User ID
+            default: Value returned if the user has no token
+
+        Returns:
+            str: Device token, or default
+        """
+        index = self._index(user_id)
+        with self._locks[index]:
+            return self._shards[index].get(user_id, default)
+
+    def set(self, user_id, device_token):
+        """
+        Set a user's device token
+
+        Args:
+            user_id (str): User ID
+            device_token (str): FCM device token
+        """
+        index = self._index(user_id)
+        with self._locks[index]:
+            self._shards[index][user_id] = device_token
+
+    def remove(self, user_id):
+        """
+        Remove a user's device token
+
+        Args:
+            user_id (str): User ID
+
+        Returns:
+            bool: True if the user had a token
+        """
+        index = self._index(user_id)
+        with self._locks[index]:
+            return self._shards[index].pop(user_id, None) is not None
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+class RedisDeviceTokenStore(_TokenStore):
+    """
+    Device tokens kept in Redis, so every gunicorn worker sees them
+
+    Reads go through redis-py's client-side cache: with RESP3 the server
+    pushes an invalidation when a cached key changes, so repeated lookups of
+    the same receiver are served from local memory. Tokens written or read
+    through Redis are mirrored into a local DeviceTokenStore, which answers
+    while Redis is unreachable.
+
+    Writes always go to Redis and raise RedisError if it cannot be reached,
+    so the client is told to retry. A token registered during an outage is
+    still kept locally and written back to Redis on the first lookup after
+    it recovers.
+    """
+
+    def __init__(self, client, ttl, retry_interval, fallback=None):
+        """
+        Args:
+            client (redis.Redis): Redis client
+            ttl (int): Seconds a registered token is kept
+            retry_interval (float): Seconds to use only the local store after
+                Redis fails
+            fallback (DeviceTokenStore, optional): Local store
+        """
+        self._redis = client
+        self._ttl = ttl
+        self._retry_interval = retry_interval
+        self._fallback = fallback or DeviceTokenStore()
+        self._down_until = 0.0
+        # Users whose latest token only reached the local store
+        self._unsynced = set()
+        self._unsynced_lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id):
+        return f"user:{user_id}:fcm_token"
+
+    def _available(self):
+        return time.monotonic() >= self._down_until
+
+    def _mark_down(self, error):
+        logger.warning("Redis unavailable, using local device tokens: %s", error)
+        self._down_until = time.monotonic() + self._retry_interval
+
+    def _write_back(self, user_id):
+        """
+        Copy a token registered during an outage to Redis
+
+        Args:
+            user_id (str): User ID
+
+        Returns:
+            str: The local token, or None if there is none
+        """
+        token = self._fallback.get(user_id)
+        if token is not None:
+            self._redis.set(self._key(user_id), token, ex=self._ttl)
+            logger.info("Device token for user %s written back to Redis", user_id)
+        with self._unsynced_lock:
+            self._unsynced.discard(user_id)
+        return token
+
+    def get(self, user_id, default=None):
+        """
+        Get a user's device token
+
+        Args:
+            user_id (str): User ID
+            default: Value returned if the user has no token
+
+        Returns:
+            str: Device token, or default
+        """
+        if self._available():
+            try:
+                token = self._redis.get(self._key(user_id))
+                if token is None and user_id in self._unsynced:
+                    token = self._write_back(user_id)
+                elif token is None:
+                    # Unregistered (or expired) through another worker
+                    self._fallback.remove(user_id)
+                else:
+                    # Keep the local copy current for the next outage
+                    self._fallback.set(user_id, token)
+                    if user_id in self._unsynced:
+                        # Redis already has a newer registration
+                        with self._unsynced_lock:
+                            self._unsynced.discard(user_id)
+                return default if token is None else token
+            except RedisError as e:
+                self._mark_down(e)
+        return self._fallback.get(user_id, default)
+
+    def set(self, user_id, device_token):
+        """
+        Set a user's device token
+
+        Args:
+            user_id (str): User ID
+            device_token (str): FCM device token
+
+        Raises:
+            RedisError: If the token could not be written to Redis
+        """
+        self._fallback.set(user_id, device_token)
+        try:
+            self._redis.set(self._key(user_id), device_token, ex=self._ttl)
+        except RedisError as e:
+            with self._unsynced_lock:
+                self._unsynced.add(user_id)
+            self._mark_down(e)
+            raise
+        with self._unsynced_lock:
+            self._unsynced.discard(user_id)
+
+    def remove(self, user_id):
+        """
+        Remove a user's device token
+
+        Args:
+            user_id (str): User ID
+
+        Returns:
+            bool: True if the user had a token
+
+        Raises:
+            RedisError: If the token could not be deleted from Redis
+        """
+        removed = self._fallback.remove(user_id)
+        with self._unsynced_lock:
+            self._unsynced.discard(user_id)
+        try:
+            return bool(self._redis.delete(self._key(user_id))) or removed
+        except RedisError as e:
+            self._mark_down(e)
+            raise
+
+def create_device_token_store():
+    """
+    Create the device token store for this deployment
+
+    Tokens are kept in Redis when REDIS_URL is configured, and in process
+    memory otherwise.
+
+    Returns:
+        DeviceTokenStore or RedisDeviceTokenStore: Token store
+    """
+    client = get_redis_client()
+    if client is None:
+        return DeviceTokenStore()
+    return RedisDeviceTokenStore(client, Config.DEVICE_TOKEN_TTL, Config.REDIS_RETRY_INTERVAL)
@@ -1,14 +1,391 @@
 """
 Notification utilities for the CRA Mobile API
 """
+import atexit
 import logging
+import os
+import queue
+import random
+import threading
+import time
+import orjson
+import requests
+from cachetools import TTLCache
 from pyfcm import FCMNotification
+from pyfcm.errors import FCMServerError, RetryAfterException
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from twilio.http.http_client import TwilioHttpClient
+from twilio.base.exceptions import TwilioRestException
 from twilio.rest import Client
+from auth.auth import USERS
 from config.settings import Config
+from .device_tokens import create_device_token_store
+from .rate_limit import AIMDLimiter, create_token_bucket
 
-# Dictionary to store device tokens for FCM
-# In a real application, this would be stored in a database
-DEVICE_TOKENS = {}
+logger = logging.getLogger(__name__)
+
+# Settings read on every send, bound once instead of looked up on Config
+_FCM_API_KEY = Config.FCM_API_KEY
+_FCM_TIMEOUT = Config.FCM_TIMEOUT
+_TW_SID = Config.TWILIO_ACCOUNT_SID
+_TW_TOKEN = Config.TWILIO_AUTH_TOKEN
+_TW_FROM = Config.TWILIO_FROM_WHATSAPP
+_TW_TO = Config.TWILIO_TO_WHATSAPP
+_TW_RATE_LIMIT_TIMEOUT = Config.TWILIO_RATE_LIMIT_TIMEOUT
+_TW_TIMEOUT = Config.TWILIO_TIMEOUT
+
+# Push notification text for critical alerts (Arabic), and the WhatsApp
+# message; filled in with %-formatting from the alert's file number, test
+# name and value
+ALERT_TITLE = "تنبيه نتيجة حرجة"
+ALERT_MESSAGE_TEMPLATE = "رقم الملف: %s\nالفحص: %s\nالقيمة: %s"
+WHATSAPP_TEMPLATE = "🚨 *Critical Lab Result Alert* 🚨\nPatient File: %s\nTest: %s\nValue: %s"
+
+# Device tokens for FCM, safe to share between notification threads and,
+# when Redis is configured, between worker processes
+DEVICE_TOKENS = create_device_token_store()
+
+def _build_receiver_ids():
+    """
+    Collect the IDs of users with the receiver role
+    
+    Returns:
+        tuple: Receiver user IDs
+    """
+    return tuple(user["id"] for user in USERS if user["role"] == "receiver")
+
+# Users notified about every new alert, so dispatch does not scan USERS
+_RECEIVER_IDS = _build_receiver_ids()
+
+def invalidate_receiver_cache():
+    """
+    Rebuild the receiver list after users are added or their roles change
+    """
+    global _RECEIVER_IDS
+    _RECEIVER_IDS = _build_receiver_ids()
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+_RETRYABLE_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+def _never_sent(error):
+    """
+    Check whether a request failed before it could reach the server
+    
+    Only then is resending safe: after a read timeout or a dropped
+    connection, the server may already have accepted the request.
+    
+    Args:
+        error (Exception): Error raised by the call
+        
+    Returns:
+        bool: True if no connection was established
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], 'reason', None), NewConnectionError)
+    return False
+
+def _is_transient(error):
+    """
+    Check whether a failed FCM call is worth retrying
+    
+    Args:
+        error (Exception): Error raised by the call
+        
+    Returns:
+        bool: True for rate limiting, server errors and failed connections
+    """
+    # pyfcm raises FCMServerError for every unexpected status, 429 and 5xx included
+    if isinstance(error, (FCMServerError, RetryAfterException)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and error.response.status_code in _RETRYABLE_STATUSES
+    if isinstance(error, requests.exceptions.RequestException):
+        return _never_sent(error)
+    message = str(error).lower()
+    return "rate limit" in message or "quota" in message
+
+def _is_transient_twilio(error):
+    """
+    Check whether a failed Twilio message request is safe to retry
+    
+    Creating a message is not idempotent, so only failures where Twilio
+    cannot have accepted the message are retried: an error status in the
+    response, or no connection at all.
+    
+    Args:
+        error (Exception): Error raised by the call
+        
+    Returns:
+        bool: True if the message can be sent again
+    """
+    if isinstance(error, TwilioRestException):
+        return error.status in _RETRYABLE_STATUSES
+    return _never_sent(error)
+
+def _retry(call, *, transient=_is_transient, attempts=3, base=0.5, cap=8.0):
+    """
+    Call a function, retrying transient failures with exponential backoff
+    
+    Waits double after each failure, up to cap seconds, plus a little
+    jitter so that retries from concurrent sends do not line up.
+    
+    Args:
+        call (callable): Function taking no arguments
+        transient (callable): Predicate telling whether an error is retried
+        attempts (int): Maximum number of calls
+        base (float): Wait after the first failure (seconds)
+        cap (float): Maximum wait between calls (seconds)
+        
+    Returns:
+        The call's return value; the last error is raised if every attempt fails
+    """
+    for attempt in range(attempts):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == attempts - 1 or not transient(e):
+                raise
+            delay = min(cap, base * 2 ** attempt) + random.uniform(0, 0.25)
+            logger.warning("Transient notification error (%s), retrying in %.2fs", e, delay)
+            time.sleep(delay)
+
+# Number of FCM requests allowed in flight, tuned to FCM's current latency
+_fcm_limiter = AIMDLimiter(
+    initial=Config.FCM_CONCURRENCY_INITIAL,
+    minimum=Config.FCM_CONCURRENCY_MIN,
+    maximum=Config.FCM_CONCURRENCY_MAX,
+    target_latency=Config.FCM_TARGET_LATENCY
+)
+
+def _limit_fcm(call):
+    """
+    Run an FCM request once the concurrency limiter allows it
+    
+    The request's latency, and whether it failed with a transient error,
+    feed back into the limit.
+    
+    Args:
+        call (callable): Function taking no arguments that sends the request
+        
+    Returns:
+        The call's return value
+    """
+    _fcm_limiter.acquire()
+    start = time.monotonic()
+    overloaded = False
+    try:
+        return call()
+    except Exception as e:
+        # A timeout is not retried, but still means FCM is slow
+        overloaded = _is_transient(e) or isinstance(e, requests.exceptions.Timeout)
+        raise
+    finally:
+        _fcm_limiter.release(time.monotonic() - start, overloaded)
+
+# Maximum number of device tokens per FCM multicast request
+FCM_MULTICAST_LIMIT = 500
+
+# Alerts waiting to be dispatched by the background workers
+_alert_queue = queue.Queue(maxsize=Config.NOTIFICATION_QUEUE_SIZE)
+
+# Alerts waiting for their WhatsApp message. Twilio sends are slow and rate
+# limited, so they have their own workers and never hold up FCM pushes.
+_whatsapp_queue = queue.Queue(maxsize=Config.NOTIFICATION_QUEUE_SIZE)
+_worker_lock = threading.Lock()
+_worker_pid = None
+
+# Alerts notified recently, keyed by (file_number, test_name, value), so a
+# result re-posted by the lab instrument does not notify everyone again.
+# The cache is per process: a re-post handled by another gunicorn worker is
+# still notified.
+_alert_dedup = TTLCache(maxsize=Config.NOTIFICATION_DEDUP_SIZE, ttl=Config.NOTIFICATION_DEDUP_TTL)
+_alert_dedup_lock = threading.Lock()
+
+def _alert_key(alert_data):
+    return (alert_data.file_number, alert_data.test_name, alert_data.value)
+
+def _claim_alert(alert_data):
+    """
+    Record that an alert is being notified, unless an identical one was
+    
+    Args:
+        alert_data (Alert): Alert data
+        
+    Returns:
+        bool: True if the alert should be notified, False if it is a duplicate
+    """
+    key = _alert_key(alert_data)
+    with _alert_dedup_lock:
+        if key in _alert_dedup:
+            return False
+        _alert_dedup[key] = alert_data.id
+    return True
+
+def _release_alert(alert_data):
+    """
+    Forget an alert that could not be notified, so a later copy gets through
+    
+    Args:
+        alert_data (Alert): Alert data
+    """
+    with _alert_dedup_lock:
+        _alert_dedup.pop(_alert_key(alert_data), None)
+
+# Alerts whose channels have not all reported back, keyed by alert ID:
+# [channels still sending, whether any channel sent]
+_alert_outcomes = {}
+
+def _expect_outcomes(alert_data, channels):
+    """
+    Start tracking the channels an alert is being sent on
+    
+    Args:
+        alert_data (Alert): Alert data
+        channels (int): Number of channels that will call _record_outcome
+    """
+    with _alert_dedup_lock:
+        _alert_outcomes[alert_data.id] = [channels, False]
+
+def _record_outcome(alert_data, sent):
+    """
+    Record whether one of an alert's channels sent its notification
+    
+    Once every channel has reported and none sent anything, the alert is
+    released so the lab's re-post gets through instead of being dropped.
+    
+    Args:
+        alert_data (Alert): Alert data
+        sent (bool): True if the channel sent a notification
+    """
+    with _alert_dedup_lock:
+        outcome = _alert_outcomes[alert_data.id]
+        outcome[0] -= 1
+        outcome[1] = outcome[1] or sent
+        if outcome[0]:
+            return
+        del _alert_outcomes[alert_data.id]
+        if not outcome[1]:
+            _alert_dedup.pop(_alert_key(alert_data), None)
+
+# One keep-alive connection pool to FCM, shared by every thread. pyfcm keeps
+# per-request state on FCMNotification, so each thread gets its own instance
+# mounted on the shared pool.
+_push_adapter = None
+_push_lock = threading.Lock()
+_push_local = threading.local()
+
+def _get_push_adapter():
+    """
+    Get the HTTP adapter holding the pooled connections to FCM
+    
+    Returns:
+        HTTPAdapter: Shared adapter, created on first use
+    """
+    global _push_adapter
+    if _push_adapter is None:
+        with _push_lock:
+            if _push_adapter is None:
+                # Failed sends are retried by _retry, not by the adapter
+                _push_adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=Config.FCM_POOL_SIZE,
+                    max_retries=0
+                )
+    return _push_adapter
+
+class _OrjsonFCMNotification(FCMNotification):
+    """
+    FCMNotification that encodes request payloads with orjson
+    
+    Output matches pyfcm's own encoding (compact, sorted keys, UTF-8 rather
+    than escaped Arabic text) at a fraction of the stdlib json cost.
+    """
+
+    def json_dumps(self, data):
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+
+def _get_push_service():
+    """
+    Get this thread's FCM client, reusing connections across calls
+    
+    Returns:
+        FCMNotification: FCM client
+    """
+    push_service = getattr(_push_local, 'push_service', None)
+    if push_service is None:
+        push_service = _OrjsonFCMNotification(api_key=_FCM_API_KEY, adapter=_get_push_adapter())
+        _push_local.push_service = push_service
+    return push_service
+
+# Twilio client shared by every WhatsApp alert, so its keep-alive connection
+# to api.twilio.com is reused
+_twilio_client = None
+_twilio_lock = threading.Lock()
+
+# Keeps WhatsApp sends within Twilio's per-sender messages-per-second limit,
+# across all worker processes (see create_token_bucket). Created on first
+# use, in the gunicorn worker, once the number of workers is known.
+_twilio_bucket = None
+
+def _get_twilio_client():
+    """
+    Get the shared Twilio client, creating it on first use
+    
+    Returns:
+        Client: Twilio REST client
+    """
+    global _twilio_client
+    if _twilio_client is None:
+        with _twilio_lock:
+            if _twilio_client is None:
+                http_client = TwilioHttpClient(pool_connections=True, timeout=_TW_TIMEOUT)
+                http_client.session.mount('https://', HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=Config.TWILIO_POOL_SIZE,
+                    max_retries=0
+                ))
+                _twilio_client = Client(_TW_SID, _TW_TOKEN, http_client=http_client)
+    return _twilio_client
+
+def _get_twilio_bucket():
+    """
+    Get the WhatsApp rate limit, creating it on first use
+    
+    Returns:
+        TokenBucket or RedisTokenBucket: Rate limit
+    """
+    global _twilio_bucket
+    if _twilio_bucket is None:
+        with _twilio_lock:
+            if _twilio_bucket is None:
+                _twilio_bucket = create_token_bucket("twilio_whatsapp", Config.TWILIO_MPS)
+    return _twilio_bucket
+
+def reload_config():
+    """
+    Re-read the notification settings from Config (e.g. after tests change it)
+    
+    Clients built with the old credentials are dropped and recreated on
+    next use.
+    """
+    global _FCM_API_KEY, _FCM_TIMEOUT, _TW_SID, _TW_TOKEN, _TW_FROM, _TW_TO
+    global _TW_RATE_LIMIT_TIMEOUT, _TW_TIMEOUT, _push_local, _twilio_client, _twilio_bucket
+    _FCM_API_KEY = Config.FCM_API_KEY
+    _FCM_TIMEOUT = Config.FCM_TIMEOUT
+    _TW_SID = Config.TWILIO_ACCOUNT_SID
+    _TW_TOKEN = Config.TWILIO_AUTH_TOKEN
+    _TW_FROM = Config.TWILIO_FROM_WHATSAPP
+    _TW_TO = Config.TWILIO_TO_WHATSAPP
+    _TW_RATE_LIMIT_TIMEOUT = Config.TWILIO_RATE_LIMIT_TIMEOUT
+    _TW_TIMEOUT = Config.TWILIO_TIMEOUT
+    with _push_lock:
+        _push_local = threading.local()
+    with _twilio_lock:
+        _twilio_client = None
+        _twilio_bucket = None
 
 def send_fcm_notification(user_id, title, message, data=None):
     """
@@ -25,17 +402,18 @@ def send_fcm_notification(user_id, title, message, data=None):
     """
     try:
         # Check if we have a device token for this user
-        if user_id not in DEVICE_TOKENS or not DEVICE_TOKENS[user_id]:
-            logging.warning(f"No device token found for user {user_id}")
+        device_token = DEVICE_TOKENS.get(user_id)
+        if not device_token:
+            logger.warning("No device token found for user %s", user_id)
             return False
             
         # Check if FCM API key is configured
-        if not Config.FCM_API_KEY:
-            logging.warning("FCM API key not configured")
+        if not _FCM_API_KEY:
+            logger.warning("FCM API key not configured")
             return False
             
-        # Initialize FCM
-        push_service = FCMNotification(api_key=Config.FCM_API_KEY)
+        # Reuse the pooled FCM client
+        push_service = _get_push_service()
         
         # Prepare data payload
         data_payload = data or {}
@@ -45,17 +423,83 @@ def send_fcm_notification(user_id, title, message, data=None):
         })
         
         # Send notification
-        result = push_service.notify_single_device(
-            registration_id=DEVICE_TOKENS[user_id],
+        result = _retry(lambda: _limit_fcm(lambda: push_service.notify_single_device(
+            registration_id=device_token,
             message_title=title,
             message_body=message,
-            data_message=data_payload
-        )
+            data_message=data_payload,
+            timeout=_FCM_TIMEOUT
+        )))
         
-        logging.info(f"FCM notification sent to user {user_id}: {result}")
+        logger.info("FCM notification sent to user %s: %s", user_id, result)
         return True
     except Exception as e:
-        logging.error(f"Error sending FCM notification: {e}")
+        logger.error("Error sending FCM notification: %s", e)
+        return False
+
+def send_fcm_multicast(user_ids, title, message, data=None):
+    """
+    Send one Firebase Cloud Messaging notification to several users
+    
+    Tokens are sent in multicast requests of up to FCM_MULTICAST_LIMIT
+    devices instead of one request per device. Users without a registered
+    device are skipped.
+    
+    Args:
+        user_ids (list): User IDs to send notification to
+        title (str): Notification title
+        message (str): Notification message
+        data (dict, optional): Additional data to send
+        
+    Returns:
+        bool: True if at least one device accepted the notification
+    """
+    try:
+        recipients = DEVICE_TOKENS.get_many(user_ids)
+        if not recipients:
+            logger.warning("No device tokens found for users %s", user_ids)
+            return False
+            
+        # Check if FCM API key is configured
+        if not _FCM_API_KEY:
+            logger.warning("FCM API key not configured")
+            return False
+            
+        # Reuse the pooled FCM client
+        push_service = _get_push_service()
+        
+        # Prepare data payload
+        data_payload = dict(data or {})
+        data_payload.update({
+            "title": title,
+            "body": message
+        })
+        
+        # Send notification in multicast batches
+        sent = False
+        for start in range(0, len(recipients), FCM_MULTICAST_LIMIT):
+            batch = recipients[start:start + FCM_MULTICAST_LIMIT]
+            result = _retry(lambda: _limit_fcm(lambda: push_service.notify_multiple_devices(
+                registration_ids=[token for _, token in batch],
+                message_title=title,
+                message_body=message,
+                data_message=data_payload,
+                timeout=_FCM_TIMEOUT
+            )))
+            
+            # Results come back in the same order as the registration IDs
+            log_sent = logger.isEnabledFor(logging.INFO)
+            for (user_id, _), user_result in zip(batch, result.get("results", [])):
+                if "error" in user_result:
+                    logger.warning("FCM notification to user %s failed: %s", user_id, user_result["error"])
+                else:
+                    sent = True
+                    if log_sent:
+                        logger.info("FCM notification sent to user %s: %s", user_id, user_result)
+        
+        return sent
+    except Exception as e:
+        logger.error("Error sending FCM multicast notification: %s", e)
         return False
 
 def register_device(user_id, device_token):
@@ -70,11 +514,11 @@ def register_device(user_id, device_token):
         bool: True if successful
     """
     try:
-        DEVICE_TOKENS[user_id] = device_token
-        logging.info(f"Device token registered for user {user_id}")
+        DEVICE_TOKENS.set(user_id, device_token)
+        logger.info("Device token registered for user %s", user_id)
         return True
     except Exception as e:
-        logging.error(f"Error registering device token: {e}")
+        logger.error("Error registering device token: %s", e)
         return False
 
 def unregister_device(user_id):
@@ -88,14 +532,16 @@ def unregister_device(user_id):
         bool: True if successful
     """
     try:
-        if user_id in DEVICE_TOKENS:
-            del DEVICE_TOKENS[user_id]
-            logging.info(f"Device token unregistered for user {user_id}")
+        if DEVICE_TOKENS.remove(user_id):
+            logger.info("Device token unregistered for user %s", user_id)
         return True
     except Exception as e:
-        logging.error(f"Error unregistering device token: {e}")
+        logger.error("Error unregistering device token: %s", e)
         return False
 
+class _RateLimitTimeout(Exception):
+    """Raised when no WhatsApp send slot frees up within TWILIO_RATE_LIMIT_TIMEOUT"""
+
 def send_whatsapp_alert(patient_id, test_name, value):
     """
     Send a WhatsApp alert using Twilio
@@ -110,77 +556,172 @@ def send_whatsapp_alert(patient_id, test_name, value):
     """
     try:
         # Check if Twilio credentials are configured
-        if not all([
-            Config.TWILIO_ACCOUNT_SID,
-            Config.TWILIO_AUTH_TOKEN,
-            Config.TWILIO_FROM_WHATSAPP,
-            Config.TWILIO_TO_WHATSAPP
-        ]):
-            logging.warning("Twilio credentials not fully configured")
+        if not (_TW_SID and _TW_TOKEN and _TW_FROM and _TW_TO):
+            logger.warning("Twilio credentials not fully configured")
             return False
             
-        # Initialize Twilio client
-        client = Client(Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN)
+        # Reuse the shared Twilio client
+        client = _get_twilio_client()
+        bucket = _get_twilio_bucket()
         
         # Create message body
-        message_body = f"🚨 *Critical Lab Result Alert* 🚨\nPatient File: {patient_id}\nTest: {test_name}\nValue: {value}"
+        message_body = WHATSAPP_TEMPLATE % (patient_id, test_name, value)
+        
+        def create_message():
+            # Every attempt, retries included, waits for a send slot rather
+            # than running into Twilio's 429s
+            if not bucket.acquire(timeout=_TW_RATE_LIMIT_TIMEOUT):
+                raise _RateLimitTimeout()
+            return client.messages.create(
+                body=message_body,
+                from_=_TW_FROM,
+                to=_TW_TO
+            )
         
         # Send message
-        message = client.messages.create(
-            body=message_body,
-            from_=Config.TWILIO_FROM_WHATSAPP,
-            to=Config.TWILIO_TO_WHATSAPP
-        )
+        message = _retry(create_message, transient=_is_transient_twilio)
         
-        logging.info(f"WhatsApp alert sent: SID={message.sid}")
+        logger.info("WhatsApp alert sent: SID=%s", message.sid)
         return True
+    except _RateLimitTimeout:
+        logger.error("WhatsApp rate limit wait timed out, alert for file %s not sent", patient_id)
+        return False
     except Exception as e:
-        logging.error(f"Error sending WhatsApp alert: {e}")
+        logger.error("Error sending WhatsApp alert: %s", e)
         return False
 
-def notify_new_alert(alert_data):
+def _dispatch_alert(alert_data):
     """
     Send notifications for a new alert to all receivers
     
+    The FCM push is sent right away; the WhatsApp message is handed to the
+    WhatsApp workers.
+    
     Args:
-        alert_data (dict): Alert data
+        alert_data (Alert): Alert data
+    """
+    # Get all users with receiver role
+    receivers = _RECEIVER_IDS
+    _expect_outcomes(alert_data, 2 if receivers else 1)
+    
+    # Queue WhatsApp notification
+    try:
+        _whatsapp_queue.put_nowait(alert_data)
+    except queue.Full:
+        logger.error("WhatsApp queue is full, dropping WhatsApp alert %s", alert_data.id)
+        _record_outcome(alert_data, False)
+    
+    if receivers:
+        message = ALERT_MESSAGE_TEMPLATE % (alert_data.file_number, alert_data.test_name, alert_data.value)
+        
+        # Send one batched FCM notification to all receivers
+        sent = False
+        try:
+            sent = send_fcm_multicast(receivers, ALERT_TITLE, message, {"alert_id": alert_data.id})
+        finally:
+            _record_outcome(alert_data, sent)
+
+def _notification_worker():
+    """
+    Dispatch queued alerts until the process exits
+    """
+    while True:
+        alert_data = _alert_queue.get()
+        try:
+            _dispatch_alert(alert_data)
+        except Exception as e:
+            logger.error("Error notifying about new alert: %s", e)
+        finally:
+            _alert_queue.task_done()
+
+def _whatsapp_worker():
+    """
+    Send queued WhatsApp alerts until the process exits
+    """
+    while True:
+        alert_data = _whatsapp_queue.get()
+        sent = False
+        try:
+            sent = send_whatsapp_alert(alert_data.file_number, alert_data.test_name, alert_data.value)
+        finally:
+            _record_outcome(alert_data, sent)
+            _whatsapp_queue.task_done()
+
+def _start_workers():
+    """
+    Start the notification workers in this process if they are not running
+
+    NOTIFICATION_WORKERS threads consume the alert queue, so one slow alert
+    does not hold up the ones behind it, and NOTIFICATION_WHATSAPP_WORKERS
+    threads send the WhatsApp messages. The process ID is checked so forked
+    workers start their own threads.
+    """
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid != os.getpid():
+            for index in range(Config.NOTIFICATION_WORKERS):
+                threading.Thread(
+                    target=_notification_worker,
+                    name=f"notification-worker-{index}",
+                    daemon=True
+                ).start()
+            for index in range(Config.NOTIFICATION_WHATSAPP_WORKERS):
+                threading.Thread(
+                    target=_whatsapp_worker,
+                    name=f"whatsapp-worker-{index}",
+                    daemon=True
+                ).start()
+            _worker_pid = os.getpid()
+
+def _drain_alert_queue():
+    """
+    Give queued alerts a chance to go out before the process exits
+    """
+    if _worker_pid != os.getpid():
+        return
+    deadline = time.monotonic() + Config.NOTIFICATION_DRAIN_TIMEOUT
+    # An alert reaches the WhatsApp queue before its alert queue task is done
+    while (_alert_queue.unfinished_tasks or _whatsapp_queue.unfinished_tasks) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    if _alert_queue.unfinished_tasks or _whatsapp_queue.unfinished_tasks:
+        logger.warning(
+            "Exiting with %s undelivered alert notifications and %s undelivered WhatsApp alerts",
+            _alert_queue.unfinished_tasks,
+            _whatsapp_queue.unfinished_tasks
+        )
+
+atexit.register(_drain_alert_queue)
+
+def notify_new_alert(alert_data):
+    """
+    Queue notifications for a new alert to all receivers
+    
+    Notifications are sent by background workers, so the caller does not
+    wait on FCM or Twilio. An alert identical to one notified within
+    NOTIFICATION_DEDUP_TTL seconds is not notified again.
+    
+    Args:
+        alert_data (Alert): Alert data
         
     Returns:
-        bool: True if at least one notification was sent
+        bool: True if the alert was queued for notification (or is a duplicate)
     """
     try:
-        # Get all users with receiver role
-        from auth.auth import USERS
-        receivers = [user["id"] for user in USERS if user["role"] == "receiver"]
-        
-        # Send FCM notifications to all receivers
-        notification_sent = False
-        for receiver_id in receivers:
-            title = "تنبيه نتيجة حرجة"
-            message = f"رقم الملف: {alert_data['file_number']}\nالفحص: {alert_data['test_name']}\nالقيمة: {alert_data['value']}"
-            
-            # Send FCM notification
-            fcm_sent = send_fcm_notification(
-                receiver_id,
-                title,
-                message,
-                {"alert_id": alert_data["id"]}
-            )
-            
-            if fcm_sent:
-                notification_sent = True
-        
-        # Send WhatsApp notification
-        whatsapp_sent = send_whatsapp_alert(
-            alert_data["file_number"],
-            alert_data["test_name"],
-            alert_data["value"]
-        )
+        if not _claim_alert(alert_data):
+            logger.info("Skipping notifications for duplicate alert %s", alert_data.id)
+            return True
         
-        if whatsapp_sent:
-            notification_sent = True
-            
-        return notification_sent
+        _start_workers()
+        _alert_queue.put_nowait(alert_data)
+        return True
+    except queue.Full:
+        # Let a later copy of this alert through, since this one was dropped
+        _release_alert(alert_data)
+        logger.error("Notification queue is full, dropping notifications for alert %s", alert_data.id)
+        return False
     except Exception as e:
-        logging.error(f"Error notifying about new alert: {e}")
+        _release_alert(alert_data)
+        logger.error("Error queueing notifications for new alert: %s", e)
         return False
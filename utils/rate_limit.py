@@ -0,0 +1,263 @@
+"""
+Client-side rate limiting for the CRA Mobile API
+"""
+import collections
+import logging
+import threading
+import time
+from redis.exceptions import RedisError
+from config.settings import Config
+from .redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    Token bucket shared between threads
+
+    Holds up to capacity tokens, refilled continuously at refill_per_sec.
+    Each call takes one token, waiting for the next refill when the bucket
+    is empty, so bursts are smoothed to the refill rate instead of being
+    rejected by the remote service.
+    """
+
+    def __init__(self, capacity, refill_per_sec):
+        """
+        Args:
+            capacity (float): Maximum number of tokens (burst size)
+            refill_per_sec (float): Tokens added per second
+        """
+        self.capacity = float(capacity)
+        self.refill_per_sec = float(refill_per_sec)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_sec)
+            self._last_refill = now
+
+    def acquire(self, timeout=None):
+        """
+        Take one token, waiting for it if necessary
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait; wait
+                indefinitely if None
+
+        Returns:
+            bool: True if a token was taken, False if the timeout expired
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+
+                # Sleep until the next token is due (or the deadline)
+                wait = (1 - self._tokens) / self.refill_per_sec
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                self._cond.wait(wait)
+
+# Refill and take one token atomically; returns the seconds to wait for the
+# next token (0 if one was taken) as a string, since Lua numbers are
+# truncated to integers in replies
+_TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+class RedisTokenBucket:
+    """
+    Token bucket kept in Redis, shared by every gunicorn worker
+
+    Tokens are refilled and taken by a Lua script using the Redis server's
+    clock, so all workers together stay within refill_per_sec. For
+    retry_interval seconds after Redis fails, calls use a local TokenBucket.
+    """
+
+    def __init__(self, client, key, capacity, refill_per_sec, fallback, retry_interval):
+        """
+        Args:
+            client (redis.Redis): Redis client
+            key (str): Redis key holding the bucket
+            capacity (float): Maximum number of tokens (burst size)
+            refill_per_sec (float): Tokens added per second
+            fallback (TokenBucket): Local bucket used while Redis fails
+            retry_interval (float): Seconds to use only the local bucket
+                after Redis fails
+        """
+        self.key = key
+        self.capacity = float(capacity)
+        self.refill_per_sec = float(refill_per_sec)
+        self._take = client.register_script(_TAKE_TOKEN_SCRIPT)
+        self._fallback = fallback
+        self._retry_interval = retry_interval
+        self._down_until = 0.0
+
+    def acquire(self, timeout=None):
+        """
+        Take one token, waiting for it if necessary
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait; wait
+                indefinitely if None
+
+        Returns:
+            bool: True if a token was taken, False if the timeout expired
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if time.monotonic() < self._down_until:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                return self._fallback.acquire(remaining)
+            try:
+                wait = float(self._take(keys=[self.key], args=[self.capacity, self.refill_per_sec]))
+            except RedisError as e:
+                logger.warning("Redis unavailable, using local rate limit for %s: %s", self.key, e)
+                self._down_until = time.monotonic() + self._retry_interval
+                continue
+            if wait <= 0:
+                return True
+
+            # Sleep until the next token is due (or the deadline)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+def create_token_bucket(name, rate_per_sec):
+    """
+    Create a rate limit shared by all worker processes where possible
+
+    With REDIS_URL configured the bucket lives in Redis. Otherwise each
+    process gets its own bucket at rate_per_sec / WEB_CONCURRENCY, which
+    keeps the total within the limit as long as WEB_CONCURRENCY matches the
+    number of worker processes (gunicorn.conf.py sets it in each worker, so
+    create buckets after the fork).
+
+    Args:
+        name (str): Name of the limit, used for the Redis key
+        rate_per_sec (float): Calls per second allowed across all workers
+
+    Returns:
+        TokenBucket or RedisTokenBucket: Rate limit
+    """
+    local_rate = rate_per_sec / max(1, Config.WEB_CONCURRENCY)
+    local = TokenBucket(capacity=max(1.0, local_rate), refill_per_sec=local_rate)
+    client = get_redis_client()
+    if client is None:
+        return local
+    return RedisTokenBucket(
+        client,
+        f"rate_limit:{name}",
+        capacity=max(1.0, rate_per_sec),
+        refill_per_sec=rate_per_sec,
+        fallback=local,
+        retry_interval=Config.REDIS_RETRY_INTERVAL
+    )
+
+class AIMDLimiter:
+    """
+    Concurrency limit tuned by additive increase, multiplicative decrease
+
+    The limit grows by a small step while the mean latency of recent calls
+    stays within the target, and is halved when latency exceeds it or the
+    remote service signals overload. Callers wait in acquire() while the
+    number of calls in flight is at the limit.
+    """
+
+    def __init__(self, initial, minimum, maximum, target_latency,
+                 window=50, adjust_every=10, increase=0.5, decrease=0.5):
+        """
+        Args:
+            initial (float): Starting concurrency limit
+            minimum (float): Lowest limit
+            maximum (float): Highest limit
+            target_latency (float): Mean latency (seconds) to stay within
+            window (int): Number of recent latencies averaged
+            adjust_every (int): Completed calls between latency checks
+            increase (float): Amount added to the limit on a good check
+            decrease (float): Factor applied to the limit on overload
+        """
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.target_latency = target_latency
+        self.adjust_every = adjust_every
+        self.increase = increase
+        self.decrease = decrease
+        self._limit = min(self.maximum, max(self.minimum, float(initial)))
+        self._in_flight = 0
+        self._completed = 0
+        self._latencies = collections.deque(maxlen=window)
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self):
+        """Current concurrency limit"""
+        return int(self._limit)
+
+    def acquire(self):
+        """
+        Wait until a call may start
+        """
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, latency, overloaded=False):
+        """
+        Record a finished call and adjust the limit
+
+        Args:
+            latency (float): Duration of the call (seconds)
+            overloaded (bool): Whether the call failed with a rate limit or
+                server error
+        """
+        with self._cond:
+            self._in_flight -= 1
+            self._completed += 1
+            self._latencies.append(latency)
+
+            if overloaded:
+                self._back_off()
+            elif self._completed % self.adjust_every == 0:
+                mean = sum(self._latencies) / len(self._latencies)
+                if mean <= self.target_latency:
+                    self._limit = min(self.maximum, self._limit + self.increase)
+                else:
+                    self._back_off()
+
+            self._cond.notify_all()
+
+    def _back_off(self):
+        self._limit = max(self.minimum, self._limit * self.decrease)
+        # Judge the new limit on fresh samples only
+        self._latencies.clear()
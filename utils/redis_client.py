@@ -0,0 +1,38 @@
+"""
+Shared Redis client for the CRA Mobile API
+"""
+import threading
+import redis
+from redis.cache import CacheConfig
+from config.settings import Config
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_redis_client():
+    """
+    Get the Redis client shared by the device token store and rate limits
+
+    One connection pool serves every caller in the process. With RESP3,
+    reads of device tokens go through redis-py's client-side cache, which
+    the server keeps current with invalidation pushes.
+
+    Returns:
+        redis.Redis: Redis client, created on first use; None if REDIS_URL
+            is not configured
+    """
+    global _client
+    if not Config.REDIS_URL:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    Config.REDIS_URL,
+                    protocol=3,
+                    cache_config=CacheConfig(max_size=Config.DEVICE_TOKEN_CACHE_SIZE),
+                    decode_responses=True,
+                    socket_timeout=Config.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=Config.REDIS_SOCKET_TIMEOUT
+                )
+    return _client